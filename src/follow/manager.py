@@ -6,10 +6,17 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from src.auth import get_headers
-from src.persistence import load_unfollowed, load_followers_cache, save_followers_cache
+from src.auth import get_headers, get_account_key
+from src.persistence import load_checkpoint, save_checkpoint, clear_checkpoint, load_unfollowed, load_followers_cache, save_followers_cache, load_activity_index, save_activity_index
 from src.utils import delay, handle_rate_limit
-from src.utils.api import get_discovery_feed, get_user_workouts, follow_user, DailyFollowLimitReached
+from src.utils.activity import ActivityIndex, activity_retention_seconds
+from src.utils.api import get_discovery_feed, get_user_workouts, follow_user, DailyFollowLimitReached, FatalApiError
+from src.utils.budget import BudgetExhausted
+from src.utils.clock import get_clock
+from src.utils.jobs import run_job
+from src.utils.log import SAMPLED
+from src.utils.quota import QuotaLedger
+from src.utils.tracing import span
 from src.webhook import send_discord_notification
 
 class FollowManager:
@@ -17,7 +24,9 @@ class FollowManager:
         self.config = config
         self.headers = get_headers()
         self.base_url = self.config['api']['base_url']
+        self.quota = QuotaLedger(get_account_key(), self.config)
         self.following_cache = load_followers_cache()
+        self.activity_index = ActivityIndex(load_activity_index())
             
     def process_workout(self, workout: dict, unfollowed: Set[str], 
                        following_cache: Dict[str, dict]) -> List[str]:
@@ -46,33 +55,62 @@ class FollowManager:
         # skip if already unfollowed or already following
         if username in unfollowed or username in following_cache:
             return False
+
+        # don't start vetting someone we can't afford to follow
+        self.job.budget.check()
             
-        # check their recent workouts to see if they're active
-        workouts = get_user_workouts(username, self.base_url, self.config)
-        if not workouts:
-            return False
-            
-        last_workout = workouts[0]
-        last_workout_time = last_workout.get('end_time', 0)
-        current_time = int(time.time())
-        
-        # if their last workout was super old, probably not worth following
-        if current_time - last_workout_time > 30 * 24 * 60 * 60:
-            return False
+        with span('follow.vet', username=username) as vet_span:
+            # if the feed showed them doing something recently, that's good enough
+            observed_max_age = self.config['follow'].get('observed_activity_max_age_days', 7) * 24 * 60 * 60
+            if self.activity_index.seen_active_within(username, observed_max_age):
+                vet_span['attributes']['verdict'] = 'active_observed'
+                return True
+
+            # otherwise check their recent workouts to see if they're active
+            workouts = get_user_workouts(username, self.base_url, self.config)
+            if not workouts:
+                vet_span['attributes']['verdict'] = 'no_workouts'
+                return False
+                
+            last_workout = workouts[0]
+            last_workout_time = last_workout.get('end_time', 0)
+            self.activity_index.observe(username, last_workout_time)
+            current_time = int(get_clock().time())
             
-        delay(self.config)
-        return True
+            # if their last workout was super old, probably not worth following
+            if current_time - last_workout_time > 30 * 24 * 60 * 60:
+                vet_span['attributes']['verdict'] = 'inactive'
+                return False
+                
+            vet_span['attributes']['verdict'] = 'active'
+            delay(self.config)
+            return True
         
     def run(self):
         # main function for following new people
+        run_job('follow', self.config, self.quota.account, self._run, self._limit_reached)
+
+    def _limit_reached(self):
+        # don't bother reading the feed if the server already cut us off today.
+        # anything we'd vet now would just get the same 403
+        resets_at = self.quota.limit_reset_time('follow')
+        if resets_at:
+            return f"daily follow limit already reached, resets at {time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime(resets_at))}"
+        return None
+
+    def _run(self, job):
         logger.info("starting follow process...")
+        self.job = job # vetting checks the budget too
         
         unfollowed = load_unfollowed()
         following_cache = load_followers_cache()
         
         followed_users_list = []
         
-        last_index = None
+        # pick up where an earlier run ran out of budget, if it was recent
+        last_index = load_checkpoint('follow', job.budget.checkpoint_max_age(self.config)).get('last_index')
+        if last_index:
+            logger.info("resuming follow process from feed index %s.", last_index)
         followed_count = 0
         target_count = self.config['follow']['target_count']
 
@@ -80,12 +118,16 @@ class FollowManager:
         
         try:
             while followed_count < target_count:
+                job.budget.check()
+
                 # get the next batch of workouts
                 workouts = get_discovery_feed(self.base_url, self.config, last_index)
                 if not workouts:
                     logger.info("no more workouts to fetch.")
                     break
                     
+                self.activity_index.observe_workouts(workouts)
+
                 for workout in workouts:
                     # process comments first
                     for comment in workout.get('comments', []):
@@ -95,12 +137,14 @@ class FollowManager:
                                 if follow_user(username, self.base_url, following_cache, self.config):
                                     followed_count += 1
                                     followed_users_list.append(username)
-                                    logger.info(f"followed {username} from comments ({followed_count}/{target_count}).")
+                                    job.budget.record_action()
+                                    self.quota.record('follow')
+                                    logger.info("followed %s from comments (%s/%s).", username, followed_count, target_count, extra=SAMPLED)
                                     if followed_count >= target_count:
                                         break
                                     delay(self.config)
                                 else:
-                                    logger.warning(f"failed to follow {username}.")
+                                    logger.warning("failed to follow %s.", username, extra=SAMPLED)
                                     break
                             except DailyFollowLimitReached:
                                 raise
@@ -116,12 +160,14 @@ class FollowManager:
                                 if follow_user(username, self.base_url, following_cache, self.config):
                                     followed_count += 1
                                     followed_users_list.append(username)
-                                    logger.info(f"followed {username} from likes ({followed_count}/{target_count}).")
+                                    job.budget.record_action()
+                                    self.quota.record('follow')
+                                    logger.info("followed %s from likes (%s/%s).", username, followed_count, target_count, extra=SAMPLED)
                                     if followed_count >= target_count:
                                         break
                                     delay(self.config)
                                 else:
-                                    logger.warning(f"failed to follow {username}.")
+                                    logger.warning("failed to follow %s.", username, extra=SAMPLED)
                                     break
                             except DailyFollowLimitReached:
                                 raise
@@ -135,25 +181,40 @@ class FollowManager:
                     break
                     
                 delay(self.config)
+
+            clear_checkpoint('follow')
+        except BudgetExhausted as e:
+            job.stopped('budget')
+            logger.warning("stopping follow process early, out of budget: %s", e)
+            save_checkpoint('follow', {'last_index': last_index, 'reason': str(e)})
         except DailyFollowLimitReached:
+            job.stopped('daily_limit')
             logger.warning("stopping follow process due to daily limit reached.")
-            send_discord_notification("daily follow limit reached!")
+            self.quota.record_limit_hit('follow')
+            send_discord_notification(f"daily follow limit reached!\n{job.budget.summary()}")
             daily_limit_hit_and_notified = True
             return
+        except FatalApiError as e:
+            job.api_failed(e)
+            logger.error("stopping follow process, api failure: %s", e)
         except KeyboardInterrupt:
+            job.stopped('interrupted')
             logger.info("follow process interrupted by user. sending summary...")
         except Exception as e:
-            logger.error(f"an error occurred during the follow process: {e}")
+            job.stopped('error', e)
+            logger.error("an error occurred during the follow process: %s", e)
             send_discord_notification(f"follow process encountered an error: {e}")
         finally:
-            save_followers_cache(following_cache)
+            with span('follow.save_cache', entries=len(following_cache)):
+                save_followers_cache(following_cache)
+            save_activity_index(self.activity_index.last_seen, activity_retention_seconds(self.config))
             
+            message = None
             if followed_count > 0:
                 message = f"followed {followed_count} new users:\n"
                 for user in followed_users_list:
                     message += f"- {user}\n"
-                send_discord_notification(message.strip())
-            elif not daily_limit_hit_and_notified:
-                send_discord_notification("follow process completed. no new users followed.")
+            if message or not daily_limit_hit_and_notified:
+                job.notify_summary(message, "follow process completed. no new users followed.")
                 
             logger.info("follow process completed.")
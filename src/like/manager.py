@@ -6,9 +6,15 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from src.auth import get_headers
+from src.auth import get_headers, get_account_key
+from src.persistence import load_checkpoint, save_checkpoint, clear_checkpoint, load_activity_index, save_activity_index
 from src.utils import delay, handle_rate_limit
-from src.utils.api import get_discovery_feed, get_workout_likes, get_last_workout_id_for_user, like_workout
+from src.utils.activity import ActivityIndex, activity_retention_seconds
+from src.utils.api import get_discovery_feed, get_workout_likes, get_last_workout_id_for_user, like_workout, FatalApiError
+from src.utils.budget import BudgetExhausted
+from src.utils.jobs import run_job
+from src.utils.log import SAMPLED
+from src.utils.quota import QuotaLedger
 from src.webhook import send_discord_notification
 
 class LikeManager:
@@ -16,24 +22,37 @@ class LikeManager:
         self.config = config
         self.headers = get_headers()
         self.base_url = self.config['api']['base_url']
+        self.quota = QuotaLedger(get_account_key(), self.config)
+        self.activity_index = ActivityIndex(load_activity_index())
         
     def run(self):
         # starting the like process, spread some love
+        run_job('like', self.config, self.quota.account, self._run)
+
+    def _run(self, job):
         logger.info("starting like process...")
         
-        index = None
+        # pick up where an earlier run ran out of budget, if it was recent
+        index = load_checkpoint('like', job.budget.checkpoint_max_age(self.config)).get('last_index')
+        if index:
+            logger.info("resuming like process from feed index %s.", index)
         liked_users = set()
         
         like_cap = self.config.get('like', {}).get('like_cap', 50)
-        logger.info(f"like settings: like_cap={like_cap}")
+        logger.info("like settings: like_cap=%s", like_cap)
 
         try:
             while len(liked_users) < like_cap:
+                job.budget.check()
+
                 # get new workouts to check
                 workouts = get_discovery_feed(self.base_url, self.config, index)
                 if not workouts or len(workouts) < 1:
                     logger.info("no more workouts to fetch for liking.")
                     break
+
+                # feed pages seen while liking also help the follow job's vetting
+                self.activity_index.observe_workouts(workouts)
                 
                 for workout in workouts:
                     workout_id = workout.get("id")
@@ -49,6 +68,8 @@ class LikeManager:
                         username = username.lower()
                         if username in liked_users:
                             continue
+
+                        job.budget.check()
                         
                         # get their last workout id to like it
                         last_id = get_last_workout_id_for_user(username, self.base_url, self.config)
@@ -56,8 +77,10 @@ class LikeManager:
                             continue
                         
                         if like_workout(last_id, self.base_url, self.config):
-                            logger.info(f"liked @{username}'s workout ({last_id}) from comments.")
+                            logger.info("liked @%s's workout (%s) from comments.", username, last_id, extra=SAMPLED)
                             liked_users.add(username)
+                            job.budget.record_action()
+                            self.quota.record('like')
                             delay(self.config)
                         
                         if len(liked_users) >= like_cap:
@@ -72,14 +95,18 @@ class LikeManager:
                         username = liker_username.lower()
                         if username in liked_users:
                             continue
+
+                        job.budget.check()
                             
                         last_id = get_last_workout_id_for_user(username, self.base_url, self.config)
                         if not last_id:
                             continue
                             
                         if like_workout(last_id, self.base_url, self.config):
-                            logger.info(f"liked @{username}'s workout ({last_id}) from workout likes.")
+                            logger.info("liked @%s's workout (%s) from workout likes.", username, last_id, extra=SAMPLED)
                             liked_users.add(username)
+                            job.budget.record_action()
+                            self.quota.record('like')
                             delay(self.config)
 
                         if len(liked_users) >= like_cap:
@@ -89,21 +116,31 @@ class LikeManager:
                         break
                 
                 # get the index for the next batch
-                last_index = workouts[-1].get('index')
-                if not last_index:
+                index = workouts[-1].get('index')
+                if not index:
                     break
                     
                 delay(self.config)
+
+            clear_checkpoint('like')
+        except BudgetExhausted as e:
+            job.stopped('budget')
+            logger.warning("stopping like process early, out of budget: %s", e)
+            save_checkpoint('like', {'last_index': index, 'reason': str(e)})
+        except FatalApiError as e:
+            job.api_failed(e)
+            logger.error("stopping like process, api failure: %s", e)
         except KeyboardInterrupt:
+            job.stopped('interrupted')
             logger.info("like process interrupted by user. sending summary...")
         except Exception as e:
-            logger.error(f"an error occurred during the liking process: {e}")
+            job.stopped('error', e)
+            logger.error("an error occurred during the liking process: %s", e)
             send_discord_notification(f"like process encountered an error: {e}")
         finally:
-            if len(liked_users) > 0:
-                message = f"liked {len(liked_users)} posts."
-                send_discord_notification(message)
-            else:
-                send_discord_notification("like process completed. no new posts liked.")
+            save_activity_index(self.activity_index.last_seen, activity_retention_seconds(self.config))
+
+            message = f"liked {len(liked_users)} posts." if liked_users else None
+            job.notify_summary(message, "like process completed. no new posts liked.")
                 
             logger.info("like process completed.")
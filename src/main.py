@@ -6,36 +6,36 @@ import yaml
 from dotenv import load_dotenv
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
+from .utils.log import setup_logging
+
+# plain logging until the config is loaded, then main() sets up the real pipeline
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # quiet down apscheduler a bit, it's chatty
 logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
-from .auth import get_headers, get_current_username
+from .auth import get_headers
 from .follow.manager import FollowManager
 from .unfollow.manager import UnfollowManager
 from .like.manager import LikeManager
 from .webhook import send_discord_notification
+from .utils.clock import get_clock
+from .utils.tracing import configure_tracing
+from .utils.profiling import run_profiled
 
 def load_config_central():
     config_path = 'config/config.yaml'
     try:
         with open(config_path, 'r') as f:
             config = yaml.safe_load(f)
-        logger.info(f"configuration loaded from {config_path}")
+        logger.info("configuration loaded from %s", config_path)
         return config
     except FileNotFoundError:
-        logger.error(f"error: config file not found at {config_path}")
+        logger.error("error: config file not found at %s", config_path)
         exit(1)
     except yaml.YAMLError as e:
-        logger.error(f"error parsing config file: {e}")
+        logger.error("error parsing config file: %s", e)
         exit(1)
 
 
@@ -69,6 +69,7 @@ def main():
     parser.add_argument('--unfollow', action='store_true', help='run unfollow process')
     parser.add_argument('--like', action='store_true', help='run like process')
     parser.add_argument('--auto', action='store_true', help='run in automatic mode with scheduler')
+    parser.add_argument('--profile', action='store_true', help='profile the --follow/--unfollow/--like run and write a report to data/profiles')
     
     args = parser.parse_args()
     
@@ -76,39 +77,53 @@ def main():
     load_dotenv()
     
     config = load_config_central()
+    setup_logging(config)
+    configure_tracing(config)
+
+    def run_job(job_name, manager_class):
+        # run a single job, under the profiler if --profile was passed
+        if args.profile:
+            run_profiled(job_name, lambda: manager_class(config).run())
+        else:
+            manager_class(config).run()
 
     if args.follow:
         logger.info("running follow process...")
-        FollowManager(config).run()
+        run_job('follow', FollowManager)
         return
         
     if args.unfollow:
         logger.info("running unfollow process...")
-        UnfollowManager(config).run()
+        run_job('unfollow', UnfollowManager)
         return
     
     if args.like:
         logger.info("running like process...")
-        LikeManager(config).run()
+        run_job('like', LikeManager)
         return
         
     if args.auto:
+        if args.profile:
+            logger.warning("--profile only applies to --follow/--unfollow/--like runs, ignoring it in automatic mode.")
         logger.info("starting automatic mode...")
         logger.info("scheduler will run the following jobs:")
         
-        logger.info(f"  - follow process: {config['scheduler']['follow_schedule']}")
-        logger.info(f"  - unfollow process: {config['scheduler']['unfollow_schedule']}")
-        logger.info(f"  - like process: {config['scheduler']['like_schedule']}")
+        logger.info("  - follow process: %s", config['scheduler']['follow_schedule'])
+        logger.info("  - unfollow process: %s", config['scheduler']['unfollow_schedule'])
+        logger.info("  - like process: %s", config['scheduler']['like_schedule'])
         
         scheduler = setup_scheduler(config)
         scheduler.start()
         logger.info("scheduler started successfully!")
         
         try:
-            while True:
-                pass # let the scheduler do its thing
+            # let the scheduler do its thing. waiting in short steps keeps ctrl+c
+            # working on windows, where an untimed wait can't be interrupted
+            while not get_clock().wait_for_shutdown(1):
+                pass
         except (KeyboardInterrupt, SystemExit):
             logger.info("shutting down scheduler...")
+            get_clock().request_shutdown() # wake up any job that's sleeping so it can wrap up
             scheduler.shutdown()
             logger.info("scheduler shut down successfully!")
     else:
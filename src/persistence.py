@@ -1,8 +1,85 @@
 import os
 import json
+import time
+import tempfile
+import logging
+from contextlib import contextmanager, ExitStack
 from datetime import datetime
 from typing import Set, Dict, Any
 
+try:
+    import fcntl
+except ImportError: # windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+from src.utils.clock import get_clock
+
+# how long to wait for another process to let go of a lock before giving up
+DEFAULT_LOCK_TIMEOUT = 30
+
+class StateLockTimeout(Exception):
+    # raised when another bot process is holding a lock for too long
+    pass
+
+def _try_lock(f):
+    # non-blocking exclusive lock, raises OSError if someone else has it
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def file_lock(lock_path: str, timeout: float = DEFAULT_LOCK_TIMEOUT, poll_interval: float = 0.1):
+    # advisory lock shared between every bot process (cron, --auto, manual runs).
+    # the os drops the lock if the process dies, so there's no stale lock cleanup.
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    f = open(lock_path, 'a+')
+    # lock waits use real time on purpose, not the clock. they're short, and state
+    # saves in the jobs' finally blocks have to finish even once shutdown was requested
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                _try_lock(f)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise StateLockTimeout(f"timed out after {timeout}s waiting for {lock_path}")
+                time.sleep(poll_interval)
+        try:
+            yield
+        finally:
+            _unlock(f)
+    finally:
+        f.close()
+
+def _lock_path_for(filepath: str) -> str:
+    return f"{filepath}.lock"
+
+@contextmanager
+def job_lock(job_name: str, timeout: float = DEFAULT_LOCK_TIMEOUT):
+    # makes sure only one copy of a job runs at a time across processes.
+    # yields False instead of raising if the lock is still held after the timeout,
+    # so the caller can skip the run
+    with ExitStack() as stack:
+        acquired = True
+        try:
+            stack.enter_context(file_lock(os.path.join('data', 'locks', f"{job_name}.lock"), timeout))
+        except StateLockTimeout:
+            acquired = False
+        yield acquired
+
 def load_json_file(filepath: str, default: Any = None) -> Any:
     # trying to load some json data from a file
     if not os.path.exists(filepath):
@@ -11,13 +88,38 @@ def load_json_file(filepath: str, default: Any = None) -> Any:
         with open(filepath, 'r') as f:
             return json.load(f)
     except json.JSONDecodeError:
+        logger.warning("could not parse %s, using default value.", filepath)
         return default
 
+def _write_json_atomic(filepath: str, data: Any):
+    # write to a temp file next to the target and swap it in, so readers
+    # never see a half-written file
+    directory = os.path.dirname(filepath) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(filepath)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 def save_json_file(filepath: str, data: Any):
-    # saving some data to a json file
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
+    # saving some data to a json file, locked and atomically replaced
+    with file_lock(_lock_path_for(filepath)):
+        _write_json_atomic(filepath, data)
+
+def update_json_file(filepath: str, update, default: Any = None) -> Any:
+    # read-modify-write under the file's lock so concurrent jobs don't
+    # overwrite each other. update() gets the current data and returns the new data.
+    with file_lock(_lock_path_for(filepath)):
+        data = update(load_json_file(filepath, default))
+        _write_json_atomic(filepath, data)
+        return data
 
 def load_whitelist() -> Set[str]:
     # loading our special list of users we don't want to unfollow
@@ -32,9 +134,61 @@ def load_followers_cache() -> Dict[str, dict]:
     return load_json_file('data/followed_cache.json', {})
 
 def save_unfollowed(users: Set[str]):
-    # saving the list of unfollowed users
-    save_json_file('data/unfollowed.json', list(users))
+    # saving the list of unfollowed users, merged with whatever other jobs saved meanwhile
+    update_json_file(
+        'data/unfollowed.json',
+        lambda current: sorted(set(current) | set(users)),
+        []
+    )
 
 def save_followers_cache(cache: Dict[str, dict]):
-    # saving our updated following cache
-    save_json_file('data/followed_cache.json', cache)
+    # saving our updated following cache, merged with whatever other jobs saved meanwhile
+    def merge(current: Dict[str, dict]) -> Dict[str, dict]:
+        current.update(cache)
+        return current
+    update_json_file('data/followed_cache.json', merge, {})
+
+def load_checkpoint(job_name: str, max_age_seconds: int) -> Dict[str, Any]:
+    # where a job left off when it stopped early, ignored once it's too old to be useful
+    checkpoint = load_json_file('data/checkpoints.json', {}).get(job_name)
+    if not checkpoint:
+        return {}
+    if get_clock().time() - checkpoint.get('saved_at', 0) > max_age_seconds:
+        return {}
+    return checkpoint
+
+def save_checkpoint(job_name: str, checkpoint: Dict[str, Any]):
+    # remembering where a job stopped so the next run can pick up from there
+    def merge(current: Dict[str, Any]) -> Dict[str, Any]:
+        current[job_name] = dict(checkpoint, saved_at=int(get_clock().time()))
+        return current
+    update_json_file('data/checkpoints.json', merge, {})
+
+def clear_checkpoint(job_name: str):
+    # the job finished normally, nothing to resume
+    def merge(current: Dict[str, Any]) -> Dict[str, Any]:
+        current.pop(job_name, None)
+        return current
+    update_json_file('data/checkpoints.json', merge, {})
+
+def load_quota_ledger() -> Dict[str, dict]:
+    # per-account daily action counts and server-side limits we've hit
+    return load_json_file('data/quota_ledger.json', {})
+
+def update_quota_ledger(update):
+    # read-modify-write of the quota ledger, update() gets and returns the whole ledger
+    update_json_file('data/quota_ledger.json', update, {})
+
+def load_activity_index() -> Dict[str, int]:
+    # last time we saw each user active in the feed, as epoch seconds
+    return load_json_file('data/activity_index.json', {})
+
+def save_activity_index(last_seen: Dict[str, int], max_age_seconds: int):
+    # merging in what we saw this run (newest timestamp wins) and dropping stale users
+    cutoff = int(get_clock().time()) - max_age_seconds
+    def merge(current: Dict[str, int]) -> Dict[str, int]:
+        for username, seen_at in last_seen.items():
+            if seen_at > current.get(username, 0):
+                current[username] = seen_at
+        return {username: seen_at for username, seen_at in current.items() if seen_at >= cutoff}
+    update_json_file('data/activity_index.json', merge, {})
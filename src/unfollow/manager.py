@@ -6,10 +6,16 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from src.auth import get_headers, get_current_username
+from src.auth import get_headers, get_account_key
 from src.persistence import load_unfollowed, load_followers_cache, save_followers_cache, load_whitelist, save_unfollowed
 from src.utils import delay, handle_rate_limit
-from src.utils.api import get_following, get_user_workouts, unfollow_user
+from src.utils.api import get_current_username, get_following, get_user_workouts, unfollow_user, FatalApiError
+from src.utils.budget import BudgetExhausted
+from src.utils.clock import get_clock
+from src.utils.jobs import run_job
+from src.utils.log import SAMPLED
+from src.utils.quota import QuotaLedger
+from src.utils.tracing import span
 from src.webhook import send_discord_notification
 
 class UnfollowManager:
@@ -17,20 +23,35 @@ class UnfollowManager:
         self.config = config
         self.headers = get_headers()
         self.base_url = self.config['api']['base_url']
+        self.quota = QuotaLedger(get_account_key(), self.config)
         self.following_cache = load_followers_cache()
             
     def run(self):
         # starting the unfollow process, time to clean up
+        run_job('unfollow', self.config, self.quota.account, self._run, self._cap_reached)
+
+    def _unfollows_left_today(self) -> int:
+        # the cap is per day, so count what earlier runs already did today
+        daily_unfollow_cap = self.config['unfollow'].get('daily_unfollow_cap', 100)
+        return daily_unfollow_cap - self.quota.count_today('unfollow')
+
+    def _cap_reached(self):
+        if self._unfollows_left_today() <= 0:
+            return f"daily unfollow cap of {self.config['unfollow'].get('daily_unfollow_cap', 100)} already reached today"
+        return None
+
+    def _run(self, job):
         logger.info("starting unfollow process...")
         
         unfollowed_inactive = []
         unfollowed_no_followback = []
         unfollowed_count = 0
+        unfollows_left_today = self._unfollows_left_today()
 
         try:
             inactive_threshold = self.config.get('unfollow', {}).get('inactive_threshold', 21)
             follow_back_threshold = self.config.get('unfollow', {}).get('follow_back_threshold', 7)
-            logger.info(f"unfollow settings: inactive_threshold={inactive_threshold} days, follow_back_threshold={follow_back_threshold} days")
+            logger.info("unfollow settings: inactive_threshold=%s days, follow_back_threshold=%s days", inactive_threshold, follow_back_threshold)
             
             unfollowed = load_unfollowed()
             following_cache = load_followers_cache()
@@ -43,11 +64,10 @@ class UnfollowManager:
                 
             # grab who we're currently following
             following = get_following(current_username, self.base_url, self.config)
-            logger.info(f"found {len(following)} users we're following.")
+            logger.info("found %s users we're following.", len(following))
             
             for username in following:
-                daily_unfollow_cap = self.config['unfollow'].get('daily_unfollow_cap', 100)
-                if unfollowed_count >= daily_unfollow_cap:
+                if unfollowed_count >= unfollows_left_today:
                     logger.info("daily unfollow cap reached. stopping.")
                     break
 
@@ -56,6 +76,8 @@ class UnfollowManager:
                     
                 if username not in following_cache:
                     continue # only unfollow people the bot followed
+
+                job.budget.check()
                     
                 # get their recent workouts to check activity
                 workouts = get_user_workouts(username, self.base_url, self.config)
@@ -64,7 +86,7 @@ class UnfollowManager:
                     
                 last_workout = workouts[0]
                 last_workout_time = last_workout.get('end_time', 0)
-                current_time = int(time.time())
+                current_time = int(get_clock().time())
                 days_since_workout = (current_time - last_workout_time) / (24 * 60 * 60)
                 
                 follow_time = following_cache[username].get('follow_time')
@@ -74,28 +96,42 @@ class UnfollowManager:
                 days_since_follow = (current_time - follow_time) / (24 * 60 * 60)
                 
                 if days_since_workout > inactive_threshold:
-                    logger.info(f"unfollowing {username} (inactive for {int(days_since_workout)} days).")
+                    logger.info("unfollowing %s (inactive for %s days).", username, int(days_since_workout), extra=SAMPLED)
                     if unfollow_user(username, self.base_url, self.config):
                         unfollowed.add(username)
                         unfollowed_count += 1
+                        job.budget.record_action()
+                        self.quota.record('unfollow')
                         unfollowed_inactive.append(f"{username} (inactive for {int(days_since_workout)}+ days)")
                         delay(self.config)
                 elif days_since_follow > follow_back_threshold:
-                    logger.info(f"unfollowing {username} (didn't follow back after {int(days_since_follow)} days).")
+                    logger.info("unfollowing %s (didn't follow back after %s days).", username, int(days_since_follow), extra=SAMPLED)
                     if unfollow_user(username, self.base_url, self.config):
                         unfollowed.add(username)
                         unfollowed_count += 1
+                        job.budget.record_action()
+                        self.quota.record('unfollow')
                         unfollowed_no_followback.append(f"{username} (hasn't followed back in {int(days_since_follow)}+ days)")
                         delay(self.config)
         
+        except BudgetExhausted as e:
+            job.stopped('budget')
+            logger.warning("stopping unfollow process early, out of budget: %s", e)
+        except FatalApiError as e:
+            job.api_failed(e)
+            logger.error("stopping unfollow process, api failure: %s", e)
         except KeyboardInterrupt:
+            job.stopped('interrupted')
             logger.info("unfollow process interrupted by user. sending summary...")
         except Exception as e:
-            logger.error(f"an error occurred during the unfollow process: {e}")
+            job.stopped('error', e)
+            logger.error("an error occurred during the unfollow process: %s", e)
             send_discord_notification(f"unfollow process encountered an error: {e}")
         finally:
-            save_unfollowed(unfollowed)
+            with span('unfollow.save_unfollowed', entries=len(unfollowed)):
+                save_unfollowed(unfollowed)
                 
+            message = None
             if unfollowed_count > 0:
                 message = f"unfollowed {unfollowed_count} users:\n"
                 if unfollowed_no_followback:
@@ -106,8 +142,6 @@ class UnfollowManager:
                     message += "users inactive:\n"
                     for user_info in unfollowed_inactive:
                         message += f"- {user_info}\n"
-                send_discord_notification(message.strip())
-            else:
-                send_discord_notification(f"unfollowed {unfollowed_count} users.")
+            job.notify_summary(message, f"unfollowed {unfollowed_count} users.")
                 
             logger.info("unfollow process completed.")
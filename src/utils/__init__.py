@@ -7,27 +7,30 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def interruptible_sleep(duration, check_interval=0.1):
-    # sleep for a bit, but you can interrupt it with ctrl+c if you're impatient
-    start_time = time.time()
-    while time.time() - start_time < duration:
-        try:
-            time.sleep(min(check_interval, duration - (time.time() - start_time)))
-        except KeyboardInterrupt:
-            logger.info("sleep interrupted by user (ctrl+c).")
-            raise # gotta let the interruption go through
+from src.utils.clock import get_clock
+from src.utils.tracing import span
+
+def interruptible_sleep(duration):
+    # sleep for a bit, but ctrl+c or a scheduler shutdown cuts it short right away
+    try:
+        get_clock().sleep(duration)
+    except KeyboardInterrupt:
+        logger.info("sleep interrupted (ctrl+c or shutdown).")
+        raise # gotta let the interruption go through
 
 def delay(config):
     # just a random delay to make us seem less like a bot, keeps us from getting banned
     delay_config = config['api']['request_delay']
     sleep_duration = random.uniform(delay_config['min'], delay_config['max'])
-    interruptible_sleep(sleep_duration)
+    with span('delay', seconds=round(sleep_duration, 3)):
+        interruptible_sleep(sleep_duration)
 
 def handle_rate_limit(config):
     # when the api tells us to chill out, we wait a bit longer
     logger.warning("rate limited. waiting for a bit.")
     sleep_duration = config['api']['rate_limit_delay']
-    interruptible_sleep(sleep_duration)
+    with span('rate_limit_wait', seconds=sleep_duration):
+        interruptible_sleep(sleep_duration)
 
 def is_user_inactive(last_post_date: str, threshold_days: int) -> bool:
     # checks if a user hasn't posted in a while, don't want to follow ghosts
@@ -35,7 +38,7 @@ def is_user_inactive(last_post_date: str, threshold_days: int) -> bool:
         return True
         
     last_post = datetime.fromisoformat(last_post_date.replace('Z', '+00:00'))
-    threshold = datetime.now() - timedelta(days=threshold_days)
+    threshold = get_clock().now() - timedelta(days=threshold_days)
     return last_post < threshold
 
 def should_unfollow_user(user: dict, whitelist: set, unfollowed: set, 
@@ -55,7 +58,7 @@ def should_unfollow_user(user: dict, whitelist: set, unfollowed: set,
     follow_date = user.get('follow_date')
     if follow_date:
         follow_date = datetime.fromisoformat(follow_date.replace('Z', '+00:00'))
-        if datetime.now() - follow_date > timedelta(days=follow_back_threshold):
+        if get_clock().now() - follow_date > timedelta(days=follow_back_threshold):
             return True
             
     return False # if none of the above, keep following for now
@@ -0,0 +1,62 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.utils.clock import get_clock
+
+logger = logging.getLogger(__name__)
+
+def _to_epoch(value) -> Optional[int]:
+    # feed timestamps show up as epoch seconds or iso strings depending on the field
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return None
+
+def activity_retention_seconds(config: dict) -> int:
+    # how long to keep users in the saved index after we last saw them
+    return config.get('activity_index', {}).get('retention_days', 30) * 24 * 60 * 60
+
+class ActivityIndex:
+    # remembers the last time we saw each user doing something, using only data
+    # the discovery feed already gave us. lets vetting skip most workout lookups.
+    def __init__(self, last_seen: Optional[Dict[str, int]] = None):
+        self.last_seen = dict(last_seen or {})
+
+    def observe(self, username: str, timestamp) -> None:
+        # record activity for a user, keeping whichever timestamp is newest
+        seen_at = _to_epoch(timestamp)
+        if not username or seen_at is None:
+            return
+        key = username.lower()
+        if seen_at > self.last_seen.get(key, 0):
+            self.last_seen[key] = seen_at
+
+    def observe_workouts(self, workouts: List[dict]) -> None:
+        # pull activity out of a page of feed workouts:
+        # - the author was active when the workout ended
+        # - commenters were active when they commented (or at least after the workout ended)
+        # - likers were active at some point after the workout ended
+        for workout in workouts:
+            end_time = workout.get('end_time')
+            self.observe(workout.get('username'), end_time)
+            for comment in workout.get('comments', []):
+                self.observe(comment.get('username'), comment.get('created_at') or end_time)
+            for like in workout.get('likes', []):
+                self.observe(like.get('username'), end_time)
+
+    def last_active(self, username: str) -> Optional[int]:
+        if not username:
+            return None
+        return self.last_seen.get(username.lower())
+
+    def seen_active_within(self, username: str, max_age_seconds: int) -> bool:
+        # true if we've seen this user do something recently enough to trust it
+        last_active = self.last_active(username)
+        if last_active is None:
+            return False
+        return int(get_clock().time()) - last_active <= max_age_seconds
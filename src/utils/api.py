@@ -8,27 +8,134 @@ logger = logging.getLogger(__name__) # logger for api stuff
 
 from src.auth import get_headers
 from src.utils import delay, handle_rate_limit 
+from src.utils.budget import metered
+from src.utils.circuit import get_breaker, CircuitOpenError
+from src.utils.clock import get_clock
+from src.utils.log import SAMPLED
+from src.utils.tracing import traced, current_span
 from src.webhook import send_discord_notification
 
 class DailyFollowLimitReached(Exception):
     # custom error for when we hit the daily follow limit, happens sometimes
     pass
 
+class FatalApiError(Exception):
+    # errors that mean the rest of the run would be wasted, the api helpers let
+    # these through instead of returning an empty result
+    pass
+
+class AuthError(FatalApiError):
+    # the api rejected our auth token, nothing will work until it's replaced
+    pass
+
+class ApiUnavailable(FatalApiError):
+    # the circuit breaker is open, or a request the run can't do without failed
+    pass
+
+# failure buckets, see classify_failure()
+AUTH = 'auth'
+RATE_LIMIT = 'rate_limit'
+TRANSIENT = 'transient'
+CLIENT = 'client'
+
+def classify_failure(status_code: Optional[int]) -> str:
+    # sorting failed requests by what they mean for the run.
+    # None is a request that never got a response (connection error, timeout)
+    if status_code is None or status_code >= 500:
+        return TRANSIENT
+    if status_code == 401:
+        return AUTH
+    if status_code == 429:
+        return RATE_LIMIT
+    return CLIENT
+
+def _request(method: str, url: str, config: dict, **kwargs) -> requests.Response:
+    # every api call goes through here so failures feed the shared circuit breaker.
+    # only transient failures count against the api, anything else means it answered.
+    breaker = get_breaker(config)
+    # the helper's span, so the status and failure kind end up in the trace
+    api_span = current_span()
+    try:
+        breaker.before_call()
+    except CircuitOpenError as e:
+        raise ApiUnavailable(str(e)) from e
+
+    try:
+        res = requests.request(method, url, headers=get_headers(), timeout=config['api'].get('request_timeout', 30), **kwargs)
+    except requests.RequestException:
+        breaker.record_failure()
+        if api_span is not None:
+            api_span['attributes']['failure'] = TRANSIENT
+        raise
+    except BaseException:
+        # anything else (ctrl+c, shutdown, a bug) isn't the api's fault, but a
+        # half-open probe still has to be released or it stays in flight forever
+        breaker.release_probe()
+        raise
+
+    failure = classify_failure(res.status_code) if res.status_code >= 400 else None
+    if api_span is not None:
+        api_span['attributes']['status'] = res.status_code
+        if failure:
+            api_span['attributes']['failure'] = failure
+    if failure == TRANSIENT:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+    if failure == AUTH:
+        raise AuthError(f"auth token rejected by the api ({res.status_code}).")
+    return res
+
+@traced('api.get_current_username')
+@metered
+def get_current_username(config: dict) -> Optional[str]:
+    # trying to grab our own username from the api
+    url = f"{config['api']['base_url']}/user/account"
+    try:
+        res = _request('get', url, config)
+        res.raise_for_status()
+        data = res.json()
+        username = data.get('username')
+        if username:
+            logger.info("fetched username: %s", username)
+            return username
+        else:
+            logger.error("username not found in api response.")
+            send_discord_notification("hevy bot could not fetch username from api.")
+            return None
+    except FatalApiError:
+        raise
+    except requests.exceptions.HTTPError as e:
+        logger.error("http error fetching username: %s", e)
+        send_discord_notification(f"hevy bot http error fetching username: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error("error fetching username: %s", e)
+        send_discord_notification(f"hevy bot error fetching username: {str(e)}")
+        return None
+
+@traced('api.get_following')
+@metered
 def get_following(username: str, base_url: str, config: dict) -> List[str]: 
     # getting all the people we're following
     url = f"{base_url}/following/{username}"
     try:
-        res = requests.get(url, headers=get_headers())
+        res = _request('get', url, config)
         if res.status_code == 429: # oh no, rate limited!
             handle_rate_limit(config)
             return []
         res.raise_for_status()
         following = res.json()
         return [user['username'] for user in following]
+    except FatalApiError:
+        raise
     except Exception as e:
-        logger.error(f"error fetching following list: {e}")
+        logger.error("error fetching following list: %s", e)
         return []
 
+@traced('api.get_user_workouts')
+@metered
 def get_user_workouts(username: str, base_url: str, config: dict, limit: int = 3, offset: int = 0) -> List[dict]: 
     # getting a user's recent workouts
     url = f"{base_url}/user_workouts_paged"
@@ -38,28 +145,32 @@ def get_user_workouts(username: str, base_url: str, config: dict, limit: int = 3
         "offset": offset
     }
     try:
-        res = requests.get(url, headers=get_headers(), params=params)
+        res = _request('get', url, config, params=params)
         if res.status_code == 429: # rate limit
             handle_rate_limit(config)
             return []
         res.raise_for_status()
         data = res.json()
         return data.get('workouts', [])
+    except FatalApiError:
+        raise
     except Exception as e:
-        logger.error(f"error fetching workouts for {username}: {e}")
+        logger.error("error fetching workouts for %s: %s", username, e, extra=SAMPLED)
         return []
 
+@traced('api.follow_user')
+@metered
 def follow_user(username: str, base_url: str, following_cache: Dict[str, dict], config: dict) -> bool: 
     # trying to follow someone
     url = f"{base_url}/follow"
     payload = {"username": username}
     try:
-        res = requests.post(url, headers=get_headers(), json=payload)
+        res = _request('post', url, config, json=payload)
         if res.status_code == 429: # rate limit
             handle_rate_limit(config)
             return False
         if res.status_code == 400:
-            logger.warning(f"failed to follow {username} (400 error).")
+            logger.warning("failed to follow %s (400 error).", username, extra=SAMPLED)
             return False
         if res.status_code == 403: # probably hit the daily limit
             error_data = res.json()
@@ -71,34 +182,40 @@ def follow_user(username: str, base_url: str, following_cache: Dict[str, dict],
         
         # update our cache so we know we followed them
         following_cache[username] = {
-            'follow_time': int(time.time())
+            'follow_time': int(get_clock().time())
         }
         
         return True
-    except DailyFollowLimitReached:
+    except (DailyFollowLimitReached, FatalApiError):
         raise # important to re-raise this
     except Exception as e:
-        logger.error(f"failed to follow {username}: {e}")
+        logger.error("failed to follow %s: %s", username, e, extra=SAMPLED)
         return False
 
+@traced('api.unfollow_user')
+@metered
 def unfollow_user(username: str, base_url: str, config: dict) -> bool: 
     # trying to unfollow someone
     url = f"{base_url}/unfollow"
     payload = {"username": username}
     try:
-        res = requests.post(url, headers=get_headers(), json=payload)
+        res = _request('post', url, config, json=payload)
         if res.status_code == 429: # rate limit
             handle_rate_limit(config)
             return False
         if res.status_code == 400:
-            logger.warning(f"failed to unfollow {username}. bad request.")
+            logger.warning("failed to unfollow %s. bad request.", username, extra=SAMPLED)
             return False
         res.raise_for_status()
         return True
+    except FatalApiError:
+        raise
     except Exception as e:
-        logger.error(f"failed to unfollow {username}: {e}")
+        logger.error("failed to unfollow %s: %s", username, e, extra=SAMPLED)
         return False
 
+@traced('api.get_discovery_feed')
+@metered
 def get_discovery_feed(base_url: str, config: dict, last_index: Optional[str] = None) -> List[dict]: 
     # getting the discovery feed, lots of posts here
     url = f"{base_url}/discover_feed_workouts_paged"
@@ -106,14 +223,19 @@ def get_discovery_feed(base_url: str, config: dict, last_index: Optional[str] =
         url = f"{url}/{last_index}" # for pagination, so we see new stuff
         
     try:
-        res = requests.get(url, headers=get_headers())
+        res = _request('get', url, config)
         
         if res.status_code == 429: # rate limit
             handle_rate_limit(config)
             return []
+
+        # every job starts from the feed, so an outage here has to fail the run
+        # instead of looking like an empty feed
+        if classify_failure(res.status_code) == TRANSIENT:
+            raise ApiUnavailable(f"discovery feed unavailable (status {res.status_code}).")
             
         if res.status_code != 200:
-            logger.warning(f"failed to fetch discovery feed. status code: {res.status_code}")
+            logger.warning("failed to fetch discovery feed. status code: %s", res.status_code)
             return []
             
         res.raise_for_status()
@@ -121,26 +243,36 @@ def get_discovery_feed(base_url: str, config: dict, last_index: Optional[str] =
         data = res.json()
         return data.get('workouts', [])
         
+    except FatalApiError:
+        raise
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise ApiUnavailable(f"discovery feed unavailable: {e}") from e
     except Exception as e:
-        logger.error(f"error fetching discovery feed: {e}")
+        logger.error("error fetching discovery feed: %s", e)
         return []
 
+@traced('api.get_workout_likes')
+@metered
 def get_workout_likes(workout_id: str, base_url: str, config: dict) -> List[str]: 
     # getting who liked a workout, good source for new follows
     url = f"{base_url}/workout_likes/{workout_id}"
     try:
-        res = requests.get(url, headers=get_headers())
+        res = _request('get', url, config)
         if res.status_code == 429: # rate limit
             handle_rate_limit(config)
             return []
         if res.status_code == 200:
             return [u['username'] for u in res.json()]
-        logger.warning(f"failed to fetch likes for workout {workout_id}. status code: {res.status_code}")
+        logger.warning("failed to fetch likes for workout %s. status code: %s", workout_id, res.status_code, extra=SAMPLED)
         return []
+    except FatalApiError:
+        raise
     except Exception as e:
-        logger.error(f"error fetching likes for workout {workout_id}: {e}")
+        logger.error("error fetching likes for workout %s: %s", workout_id, e, extra=SAMPLED)
         return []
 
+@traced('api.get_last_workout_id_for_user')
+@metered
 def get_last_workout_id_for_user(username: str, base_url: str, config: dict) -> Optional[str]: 
     # getting the id of a user's latest workout
     url = f"{base_url}/user_workouts_paged"
@@ -149,30 +281,36 @@ def get_last_workout_id_for_user(username: str, base_url: str, config: dict) ->
         "limit": 1
     }
     try:
-        res = requests.get(url, headers=get_headers(), params=params)
+        res = _request('get', url, config, params=params)
         if res.status_code == 429: # rate limit
             handle_rate_limit(config)
             return None
         if res.status_code != 200:
-            logger.warning(f"failed to get last workout id for {username}. status code: {res.status_code}")
+            logger.warning("failed to get last workout id for %s. status code: %s", username, res.status_code, extra=SAMPLED)
             return None
         data = res.json()
         workouts = data.get("workouts", [])
         return workouts[0]['id'] if workouts else None
+    except FatalApiError:
+        raise
     except Exception as e:
-        logger.error(f"error fetching last workout id for {username}: {e}")
+        logger.error("error fetching last workout id for %s: %s", username, e, extra=SAMPLED)
         return None
 
+@traced('api.like_workout')
+@metered
 def like_workout(workout_id: str, base_url: str, config: dict) -> bool: 
     # trying to like a workout, engagement!
     url = f"{base_url}/workout/like/{workout_id}"
     try:
-        res = requests.post(url, headers=get_headers())
+        res = _request('post', url, config)
         if res.status_code == 429: # another rate limit, havent encountered yet so not sure if they're real lol
             handle_rate_limit(config)
             return False
         res.raise_for_status()
         return res.status_code == 200
+    except FatalApiError:
+        raise
     except Exception as e:
-        logger.error(f"failed to like workout {workout_id}: {e}")
+        logger.error("failed to like workout %s: %s", workout_id, e, extra=SAMPLED)
         return False
@@ -0,0 +1,112 @@
+import threading
+import functools
+import logging
+from contextlib import contextmanager
+from typing import Optional
+
+from src.utils.clock import get_clock
+
+logger = logging.getLogger(__name__)
+
+# the budget for the job running in this thread, charged by @metered api calls
+_local = threading.local()
+
+class BudgetExhausted(Exception):
+    # raised between actions when a job is out of time or api calls
+    pass
+
+class JobBudget:
+    # wall-clock and api-call limits for one job run. it also keeps track of what
+    # each successful action (a follow, a like, ...) has cost so far, so the job
+    # can stop before starting something it can't afford to finish.
+    def __init__(self, job_name: str, max_minutes: Optional[float] = None, max_api_calls: Optional[int] = None):
+        self.job_name = job_name
+        self.max_seconds = max_minutes * 60 if max_minutes else None
+        self.max_api_calls = max_api_calls
+        self.started_at = get_clock().time()
+        self.api_calls = 0
+        self.actions = 0
+        self.stop_reason: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, job_name: str, config: dict) -> 'JobBudget':
+        # reads the `budget` block of the job's config section, missing limits mean unlimited
+        budget_config = config.get(job_name, {}).get('budget', {}) or {}
+        return cls(job_name, budget_config.get('max_minutes'), budget_config.get('max_api_calls'))
+
+    def elapsed(self) -> float:
+        return get_clock().time() - self.started_at
+
+    def charge_api_call(self):
+        self.api_calls += 1
+
+    def record_action(self):
+        self.actions += 1
+
+    def _cost_per_action(self):
+        # average (api calls, seconds) per action so far, None until we've done one
+        if self.actions == 0:
+            return None
+        return self.api_calls / self.actions, self.elapsed() / self.actions
+
+    def check(self):
+        # call this before starting a new action. raises BudgetExhausted if the
+        # job is out of budget, or if the next action is expected to cost more
+        # than what's left.
+        elapsed = self.elapsed()
+        if self.max_seconds is not None and elapsed >= self.max_seconds:
+            self._stop(f"deadline of {self.max_seconds / 60:g} min reached")
+        if self.max_api_calls is not None and self.api_calls >= self.max_api_calls:
+            self._stop(f"api call budget of {self.max_api_calls} used up")
+
+        cost = self._cost_per_action()
+        if cost is None:
+            return
+        calls_per_action, seconds_per_action = cost
+        if self.max_api_calls is not None and self.max_api_calls - self.api_calls < calls_per_action:
+            self._stop(f"only {self.max_api_calls - self.api_calls} api calls left, actions cost ~{calls_per_action:.1f}")
+        if self.max_seconds is not None and self.max_seconds - elapsed < seconds_per_action:
+            self._stop(f"only {self.max_seconds - elapsed:.0f}s left, actions take ~{seconds_per_action:.0f}s")
+
+    def _stop(self, reason: str):
+        self.stop_reason = reason
+        raise BudgetExhausted(reason)
+
+    def checkpoint_max_age(self, config: dict) -> int:
+        # how long a checkpoint from an early stop stays worth resuming from
+        return (config.get(self.job_name, {}).get('budget', {}) or {}).get('resume_within_minutes', 120) * 60
+
+    def summary(self) -> str:
+        # one line for the discord summary with limits and what was actually spent
+        calls_limit = self.max_api_calls if self.max_api_calls is not None else 'unlimited'
+        time_limit = f"{self.max_seconds / 60:g}" if self.max_seconds is not None else 'unlimited'
+        line = f"budget: {self.api_calls}/{calls_limit} api calls, {self.elapsed() / 60:.1f}/{time_limit} min"
+        cost = self._cost_per_action()
+        if cost is not None:
+            line += f", ~{cost[0]:.1f} calls and ~{cost[1]:.0f}s per action"
+        if self.stop_reason:
+            line += f". stopped early: {self.stop_reason}"
+        return line
+
+    @contextmanager
+    def activate(self):
+        # make this the budget that @metered api calls in this thread get charged to
+        previous = getattr(_local, 'budget', None)
+        _local.budget = self
+        try:
+            yield self
+        finally:
+            _local.budget = previous
+
+def current_budget() -> Optional[JobBudget]:
+    return getattr(_local, 'budget', None)
+
+def metered(func):
+    # decorator for api helpers, charges one call to the active job budget
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        budget = current_budget()
+        if budget is not None:
+            budget.charge_api_call()
+        return func(*args, **kwargs)
+    return wrapper
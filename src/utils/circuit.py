@@ -0,0 +1,82 @@
+import threading
+import logging
+from typing import Optional
+
+from src.utils.clock import get_clock
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    # raised instead of making a request while the api looks like it's down
+    pass
+
+class CircuitBreaker:
+    # shared by every api call. after enough failures in a row it opens and calls
+    # fail fast; once reset_timeout has passed it lets one probe request through
+    # and closes again if that works.
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 300):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        # raises CircuitOpenError if this call shouldn't go out
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN:
+                waited = get_clock().time() - self.opened_at
+                if waited < self.reset_timeout:
+                    raise CircuitOpenError(f"api circuit open after {self.failures} failures, retrying in {self.reset_timeout - waited:.0f}s")
+                logger.info("api circuit half-open, sending a probe request.")
+                self.state = HALF_OPEN
+            if self._probe_in_flight:
+                raise CircuitOpenError("api circuit half-open, waiting on the probe request")
+            self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("api probe succeeded, closing circuit.")
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        # a call ended without an answer from the api (ctrl+c, shutdown, a local bug).
+        # that says nothing about the api, so just let the next call probe instead
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning("api circuit opened after %s consecutive failures.", self.failures)
+                self.state = OPEN
+                self.opened_at = get_clock().time()
+
+_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+def get_breaker(config: dict) -> CircuitBreaker:
+    # the one breaker for the whole process, built from config on first use
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            breaker_config = config['api'].get('circuit_breaker', {})
+            _breaker = CircuitBreaker(
+                breaker_config.get('failure_threshold', 5),
+                breaker_config.get('reset_timeout', 300)
+            )
+        return _breaker
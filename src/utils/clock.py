@@ -0,0 +1,88 @@
+import time
+import threading
+from abc import ABC, abstractmethod
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class ShutdownRequested(KeyboardInterrupt):
+    # raised out of a sleep when the bot is shutting down. it's a KeyboardInterrupt
+    # so the managers treat it just like ctrl+c and still send their summaries.
+    pass
+
+class Clock(ABC):
+    # everything that needs the current time or wants to wait goes through a clock,
+    # so tests and benchmarks can swap in a simulated one
+    def __init__(self):
+        self._shutdown = threading.Event()
+
+    @abstractmethod
+    def time(self) -> float:
+        pass
+
+    @abstractmethod
+    def sleep(self, duration: float):
+        pass
+
+    def now(self) -> datetime:
+        # current time as an aware utc datetime
+        return datetime.fromtimestamp(self.time(), timezone.utc)
+
+    def request_shutdown(self):
+        # wakes up every sleeping job right away
+        self._shutdown.set()
+
+    def shutdown_requested(self) -> bool:
+        return self._shutdown.is_set()
+
+    def wait_for_shutdown(self, timeout: Optional[float] = None) -> bool:
+        # blocks until request_shutdown() is called (or the timeout runs out)
+        return self._shutdown.wait(timeout)
+
+class SystemClock(Clock):
+    # real time. sleeps wait on an event instead of polling, so they cost one
+    # wakeup and end immediately on shutdown.
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, duration: float):
+        if duration <= 0:
+            return
+        if self._shutdown.wait(duration):
+            raise ShutdownRequested("shutdown requested during sleep")
+
+class SimulatedClock(Clock):
+    # fake time that only moves when someone sleeps or calls advance(),
+    # so a day of delays and rate-limit waits runs in no real time at all
+    def __init__(self, start: Optional[float] = None):
+        super().__init__()
+        self._now = time.time() if start is None else start
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        with self._lock:
+            return self._now
+
+    def advance(self, seconds: float):
+        with self._lock:
+            self._now += seconds
+
+    def sleep(self, duration: float):
+        if self._shutdown.is_set():
+            raise ShutdownRequested("shutdown requested during sleep")
+        if duration > 0:
+            self.advance(duration)
+
+_clock: Clock = SystemClock()
+
+def get_clock() -> Clock:
+    return _clock
+
+def set_clock(clock: Clock) -> Clock:
+    # swap the global clock (e.g. for a SimulatedClock), returns the old one
+    global _clock
+    previous = _clock
+    _clock = clock
+    return previous
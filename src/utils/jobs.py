@@ -0,0 +1,65 @@
+import logging
+from typing import Callable, Optional
+
+from src.persistence import job_lock
+from src.utils.budget import JobBudget
+from src.utils.log import log_context
+from src.utils.tracing import span
+from src.webhook import send_discord_notification
+
+logger = logging.getLogger(__name__)
+
+class JobRun:
+    # one run of a job: its budget, its trace span and how it ended
+    def __init__(self, job_name: str, config: dict, run_span: dict):
+        self.job_name = job_name
+        self.budget = JobBudget.from_config(job_name, config)
+        self.span = run_span
+        self.api_failure: Optional[str] = None
+
+    def stopped(self, outcome: str, error: Optional[Exception] = None):
+        # note how the run ended, it becomes the outcome of the run's span
+        self.span['outcome'] = outcome
+        if error is not None:
+            self.span['error'] = str(error)
+
+    def api_failed(self, error: Exception):
+        self.api_failure = str(error)
+        self.stopped('api_failure', error)
+
+    def notify_summary(self, done_message: Optional[str], idle_message: str):
+        # end of run discord summary. done_message lists what the job did, idle_message
+        # is used when it did nothing. api failures and the budget line are added here
+        if done_message:
+            message = done_message.rstrip('\n') + '\n'
+            if self.api_failure:
+                message += f"stopped early, api failure: {self.api_failure}\n"
+            message += self.budget.summary()
+        elif self.api_failure:
+            message = f"{self.job_name} process failed: {self.api_failure}\n{self.budget.summary()}"
+        else:
+            message = f"{idle_message}\n{self.budget.summary()}"
+        send_discord_notification(message)
+
+def run_job(job_name: str, config: dict, account: str, body: Callable[[JobRun], None],
+            skip_reason: Optional[Callable[[], Optional[str]]] = None):
+    # shared wrapper for every job: log context, one trace span per run, the
+    # cross-process job lock, an optional check that can skip the run before any
+    # api work, and the job's budget. body gets the JobRun.
+    with log_context(job=job_name, account=account), span(f'{job_name}.run') as run_span:
+        lock_timeout = config.get('locking', {}).get('job_wait_timeout', 60)
+        with job_lock(job_name, lock_timeout) as acquired:
+            if not acquired:
+                logger.warning("another %s job is still running after waiting %ss. skipping this run.", job_name, lock_timeout)
+                run_span['outcome'] = 'skipped'
+                return
+
+            reason = skip_reason() if skip_reason else None
+            if reason:
+                logger.info("%s. skipping this run.", reason)
+                run_span['outcome'] = 'skipped'
+                return
+
+            job = JobRun(job_name, config, run_span)
+            with job.budget.activate():
+                body(job)
@@ -0,0 +1,139 @@
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+from src.utils.tracing import current_span
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# pass as extra= on repetitive per-user lines so big runs can sample them
+SAMPLED = {'sampled': True}
+
+# most sampled message keys remembered at once, the oldest are forgotten first
+MAX_SAMPLED_KEYS = 1000
+
+# job/account for whatever job is running in this thread
+_local = threading.local()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+@contextmanager
+def log_context(**fields):
+    # attach fields (job, account, ...) to every log line from this thread
+    previous = getattr(_local, 'fields', {})
+    _local.fields = {**previous, **fields}
+    try:
+        yield
+    finally:
+        _local.fields = previous
+
+class JobContextFilter(logging.Filter):
+    # stamps records with the job context. runs in the thread that logged, since
+    # the context is per thread and the writer thread wouldn't see it
+    def filter(self, record):
+        fields = getattr(_local, 'fields', {})
+        record.job = fields.get('job')
+        record.account = fields.get('account')
+        span = current_span()
+        record.job_id = span['trace_id'] if span else None
+        record.phase = span['name'] if span else None
+        return True
+
+class SamplingFilter(logging.Filter):
+    # lets the first `first` copies of a sampled message through in each job run,
+    # then only every `every`th one. messages are grouped by their unformatted
+    # template, so "followed %s" counts as one message no matter the user.
+    def __init__(self, first: int = 20, every: int = 10):
+        super().__init__()
+        self.first = first
+        self.every = every
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False):
+            return True
+        key = (getattr(record, 'job_id', None), record.name, record.msg)
+        with self._lock:
+            count = self._counts.pop(key, 0) + 1
+            self._counts[key] = count
+            # keys are per job run, so old runs' counts just pile up otherwise
+            while len(self._counts) > MAX_SAMPLED_KEYS:
+                self._counts.popitem(last=False)
+        if count <= self.first:
+            return True
+        return self.every > 0 and (count - self.first) % self.every == 0
+
+class ExcInfoQueueHandler(logging.handlers.QueueHandler):
+    # the stock prepare() bakes the traceback into the message and drops exc_info,
+    # which would leave the json formatter without an exception field. the queue
+    # never leaves the process, so the record can keep it.
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    # one json object per line, with the job context fields
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'job': getattr(record, 'job', None),
+            'job_id': getattr(record, 'job_id', None),
+            'account': getattr(record, 'account', None),
+            'phase': getattr(record, 'phase', None),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop() # flushes whatever is still queued
+        _listener = None
+
+def setup_logging(config: Optional[dict] = None):
+    # (re)configures the root logger. with async on, loggers only put records on a
+    # queue and a background thread does the slow writing to the console.
+    global _listener
+    logging_config = (config or {}).get('logging', {})
+    sampling_config = logging_config.get('sampling', {})
+
+    _stop_listener()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(logging_config.get('level', 'INFO'))
+
+    stream_handler = logging.StreamHandler()
+    if logging_config.get('format', 'text') == 'json':
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    if logging_config.get('async', False):
+        front_handler = ExcInfoQueueHandler(queue.SimpleQueue())
+        _listener = logging.handlers.QueueListener(front_handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        front_handler = stream_handler
+
+    front_handler.addFilter(JobContextFilter())
+    if sampling_config.get('enabled', False):
+        front_handler.addFilter(SamplingFilter(sampling_config.get('first', 20), sampling_config.get('every', 10)))
+    root.addHandler(front_handler)
+
+atexit.register(_stop_listener)
@@ -0,0 +1,42 @@
+import os
+import io
+import time
+import cProfile
+import pstats
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+def run_profiled(job_name: str, func, output_dir: str = 'data/profiles', top: int = 40):
+    # run a job under cProfile and write both the raw stats and a readable report.
+    # wall time and cpu time are reported separately so sleeping shows up clearly.
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    base_path = os.path.join(output_dir, f"{job_name}-{stamp}")
+
+    profiler = cProfile.Profile()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        return profiler.runcall(func)
+    finally:
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+
+        profiler.dump_stats(f"{base_path}.prof")
+
+        report = io.StringIO()
+        report.write(f"job: {job_name}\n")
+        report.write(f"wall time: {wall_time:.2f}s\n")
+        report.write(f"cpu time: {cpu_time:.2f}s\n")
+        report.write(f"waiting (wall - cpu): {wall_time - cpu_time:.2f}s\n\n")
+        stats = pstats.Stats(profiler, stream=report)
+        stats.sort_stats('cumulative').print_stats(top)
+        report.write("\n")
+        stats.sort_stats('tottime').print_stats(top)
+
+        with open(f"{base_path}.txt", 'w') as f:
+            f.write(report.getvalue())
+
+        logger.info("profile for %s written to %s.txt (wall %.2fs, cpu %.2fs)", job_name, base_path, wall_time, cpu_time)
@@ -0,0 +1,76 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from src.persistence import load_quota_ledger, update_quota_ledger
+from src.utils.clock import get_clock
+
+logger = logging.getLogger(__name__)
+
+# how many days of per-day counts to keep around
+KEEP_DAYS = 14
+
+class QuotaLedger:
+    # per-account, per-day record of follows/unfollows/likes plus any server-side
+    # daily limit we've run into, saved in data/quota_ledger.json so every run
+    # (cron, --auto, manual) knows about it before doing any work
+    def __init__(self, account: str, config: dict):
+        self.account = account
+        self.reset_hour = config.get('quota', {}).get('reset_hour_utc', 0)
+
+    def _today(self) -> str:
+        # a "day" runs from one reset_hour_utc to the next, same boundary as _next_reset()
+        return (get_clock().now() - timedelta(hours=self.reset_hour)).strftime('%Y-%m-%d')
+
+    def _account_entry(self) -> dict:
+        return load_quota_ledger().get(self.account, {})
+
+    def _update_account(self, update):
+        def merge(ledger: dict) -> dict:
+            entry = ledger.setdefault(self.account, {'days': {}, 'limits': {}})
+            update(entry)
+            # drop old days so the file stays small
+            cutoff = (get_clock().now() - timedelta(days=KEEP_DAYS)).strftime('%Y-%m-%d')
+            entry['days'] = {day: counts for day, counts in entry['days'].items() if day >= cutoff}
+            return ledger
+        update_quota_ledger(merge)
+
+    def record(self, action: str, count: int = 1):
+        # add successful actions to today's count
+        today = self._today()
+        def update(entry: dict):
+            counts = entry['days'].setdefault(today, {})
+            counts[action] = counts.get(action, 0) + count
+        self._update_account(update)
+
+    def count_today(self, action: str) -> int:
+        return self._account_entry().get('days', {}).get(self._today(), {}).get(action, 0)
+
+    def _next_reset(self) -> datetime:
+        # the api doesn't tell us when the limit resets, so assume it's the next reset_hour_utc
+        now = get_clock().now()
+        reset = now.replace(hour=self.reset_hour, minute=0, second=0, microsecond=0)
+        if reset <= now:
+            reset += timedelta(days=1)
+        return reset
+
+    def record_limit_hit(self, action: str):
+        # remember that the server said no more of this action today
+        now = get_clock().now()
+        resets_at = self._next_reset()
+        def update(entry: dict):
+            entry['limits'][action] = {
+                'hit_at': int(now.timestamp()),
+                'resets_at': int(resets_at.timestamp()),
+            }
+        self._update_account(update)
+        logger.info("recorded daily %s limit, assuming it resets at %s.", action, resets_at.isoformat())
+
+    def limit_reset_time(self, action: str) -> Optional[int]:
+        # when a recorded server limit resets, or None if there's no active limit
+        limit = self._account_entry().get('limits', {}).get(action)
+        if not limit:
+            return None
+        if get_clock().time() >= limit.get('resets_at', 0):
+            return None
+        return limit['resets_at']
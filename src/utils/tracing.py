@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import uuid
+import threading
+import functools
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# where trace records go, set up by configure_tracing() at startup
+_trace_path: Optional[str] = None
+_write_lock = threading.Lock()
+
+# each scheduler job runs in its own thread, so the span stack is per thread
+_local = threading.local()
+
+def configure_tracing(config: dict):
+    # turn tracing on/off based on the config, off if the section is missing
+    global _trace_path
+    tracing_config = config.get('tracing', {})
+    if tracing_config.get('enabled', False):
+        _trace_path = tracing_config.get('path', 'data/traces.jsonl')
+        os.makedirs(os.path.dirname(_trace_path) or '.', exist_ok=True)
+        logger.info("tracing enabled, writing spans to %s", _trace_path)
+    else:
+        _trace_path = None
+
+def _span_stack() -> list:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def current_span() -> Optional[dict]:
+    # the innermost span running in this thread, if any
+    stack = _span_stack()
+    return stack[-1] if stack else None
+
+def _write_record(record: dict):
+    if _trace_path is None:
+        return
+    line = json.dumps(record, default=str)
+    try:
+        with _write_lock:
+            with open(_trace_path, 'a') as f:
+                f.write(line + '\n')
+    except OSError as e:
+        # tracing should never take the bot down with it
+        logger.warning("failed to write trace record: %s", e)
+
+@contextmanager
+def span(name: str, **attributes):
+    # time a block of work and write it out as one jsonl record.
+    # the yielded dict can be used to attach more attributes or set the outcome.
+    parent = current_span()
+    record = {
+        'trace_id': parent['trace_id'] if parent else uuid.uuid4().hex[:16],
+        'span_id': uuid.uuid4().hex[:16],
+        'parent_id': parent['span_id'] if parent else None,
+        'name': name,
+        'start': datetime.now(timezone.utc).isoformat(),
+        'outcome': 'ok',
+        'attributes': dict(attributes),
+    }
+    stack = _span_stack()
+    stack.append(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    except KeyboardInterrupt:
+        record['outcome'] = 'interrupted'
+        raise
+    except Exception as e:
+        record['outcome'] = 'error'
+        record['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        stack.pop()
+        _write_record(record)
+
+def traced(name: str):
+    # decorator version of span() for api calls. if the request failed, the outcome
+    # is the kind of failure the api layer recorded on the span (auth, transient, ...),
+    # otherwise falsy results (the api helpers return []/None/False) are 'empty'.
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as record:
+                result = func(*args, **kwargs)
+                failure = record['attributes'].get('failure')
+                if failure:
+                    record['outcome'] = failure
+                elif not result:
+                    record['outcome'] = 'empty'
+                return result
+        return wrapper
+    return decorator
@@ -18,6 +18,6 @@ def send_discord_notification(message):
         response.raise_for_status()
         return True
     except Exception as e:
-        logger.error(f"failed to send discord alert: {e}")
+        logger.error("failed to send discord alert: %s", e)
         return False
 
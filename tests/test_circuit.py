@@ -0,0 +1,87 @@
+import pytest
+
+from src.utils.circuit import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from src.utils.clock import SimulatedClock, SystemClock, set_clock
+
+@pytest.fixture
+def clock():
+    clock = SimulatedClock(0)
+    set_clock(clock)
+    yield clock
+    set_clock(SystemClock())
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+def test_opens_at_threshold_and_fails_fast(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.advance(59)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+def test_allows_one_probe_after_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    open_breaker(breaker)
+    clock.advance(60)
+
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_probe_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    open_breaker(breaker)
+    clock.advance(60)
+    breaker.before_call()
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    breaker.before_call()
+    breaker.before_call()
+
+def test_probe_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    open_breaker(breaker)
+    clock.advance(60)
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.advance(60)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+def test_released_probe_lets_the_next_call_probe(clock):
+    # an interrupted probe isn't an api failure, the circuit stays half-open
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    open_breaker(breaker)
+    clock.advance(60)
+    breaker.before_call()
+    breaker.release_probe()
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.failures == 2
+    breaker.before_call()
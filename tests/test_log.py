@@ -0,0 +1,29 @@
+import json
+import logging
+
+from src.utils import log
+
+def test_async_json_logging_keeps_exceptions(capsys):
+    log.setup_logging({'logging': {'format': 'json', 'async': True}})
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger('test').exception("failed for %s", 'alice')
+    finally:
+        log._stop_listener() # flushes the queue
+        log.setup_logging()
+
+    entry = json.loads(capsys.readouterr().err.strip().splitlines()[-1])
+    assert entry['message'] == "failed for alice"
+    assert 'ValueError: boom' in entry['exception']
+
+def test_sampling_counts_are_bounded(monkeypatch):
+    monkeypatch.setattr(log, 'MAX_SAMPLED_KEYS', 5)
+    sampler = log.SamplingFilter(first=1, every=0)
+    for job_id in range(20):
+        record = logging.LogRecord('test', logging.INFO, __file__, 1, "followed %s", ('bob',), None)
+        record.sampled = True
+        record.job_id = job_id
+        assert sampler.filter(record)
+    assert len(sampler._counts) == 5
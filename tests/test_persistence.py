@@ -0,0 +1,30 @@
+import threading
+
+from src.persistence import file_lock
+from src.utils.clock import SimulatedClock, SystemClock, set_clock
+
+def test_lock_wait_survives_shutdown_and_simulated_time(tmp_path):
+    # saves in the jobs' finally blocks still have to get the lock during shutdown
+    lock_path = str(tmp_path / 'state.json.lock')
+    clock = SimulatedClock(0)
+    clock.request_shutdown()
+    set_clock(clock)
+    try:
+        held = threading.Event()
+        release = threading.Event()
+
+        def holder():
+            with file_lock(lock_path):
+                held.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=holder)
+        thread.start()
+        held.wait(5)
+        threading.Timer(0.3, release.set).start()
+
+        with file_lock(lock_path, timeout=5):
+            pass
+        thread.join()
+    finally:
+        set_clock(SystemClock())
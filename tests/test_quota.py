@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from src.utils.clock import SimulatedClock, SystemClock, set_clock
+from src.utils.quota import QuotaLedger
+
+def at(hour, minute=0, day=2):
+    return datetime(2026, 1, day, hour, minute, tzinfo=timezone.utc).timestamp()
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clock = SimulatedClock(at(3))
+    set_clock(clock)
+    yield clock
+    set_clock(SystemClock())
+
+def test_day_runs_from_reset_hour_to_reset_hour(clock):
+    ledger = QuotaLedger('account', {'quota': {'reset_hour_utc': 6}})
+    ledger.record('follow', 5)
+
+    # 03:00 and 05:59 are still the day that started at 06:00 the day before
+    clock.advance(at(5, 59) - clock.time())
+    assert ledger.count_today('follow') == 5
+
+    clock.advance(at(6) - clock.time())
+    assert ledger.count_today('follow') == 0
+
+def test_limit_hit_before_reset_hour_clears_at_reset(clock):
+    ledger = QuotaLedger('account', {'quota': {'reset_hour_utc': 6}})
+    ledger.record_limit_hit('follow')
+    assert ledger.limit_reset_time('follow') == at(6)
+
+    clock.advance(at(6) - clock.time())
+    assert ledger.limit_reset_time('follow') is None
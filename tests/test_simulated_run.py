@@ -0,0 +1,102 @@
+import os
+import json
+import time
+
+import pytest
+import requests
+import yaml
+
+import src.utils.circuit as circuit
+from src.follow.manager import FollowManager
+from src.utils import jobs
+from src.utils.clock import SimulatedClock, SystemClock, set_clock
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'config.yaml')
+START = 1_700_000_000
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data if data is not None else {}
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+class FakeHevy:
+    # just enough of the api for a follow run, routed on the url
+    def __init__(self, clock, feed_status=200):
+        self.clock = clock
+        self.feed_status = feed_status
+        self.followed = []
+
+    def request(self, method, url, **kwargs):
+        if '/discover_feed_workouts_paged' in url:
+            if self.feed_status != 200:
+                return FakeResponse(self.feed_status)
+            if url.endswith('/page-2'):
+                return FakeResponse(200, {'workouts': []})
+            return FakeResponse(200, {'workouts': [
+                {'id': 'w1', 'index': 'page-2',
+                 'comments': [{'username': 'alice'}, {'username': 'bob'}],
+                 'likes': [{'username': 'carol'}, {'username': 'dave'}]},
+            ]})
+        if url.endswith('/user_workouts_paged'):
+            return FakeResponse(200, {'workouts': [{'id': 'x', 'end_time': int(self.clock.time()) - 3600}]})
+        if url.endswith('/follow'):
+            self.followed.append(kwargs['json']['username'])
+            return FakeResponse(200)
+        return FakeResponse(404)
+
+@pytest.fixture
+def config():
+    with open(CONFIG_PATH) as f:
+        config = yaml.safe_load(f)
+    config['follow']['target_count'] = 3
+    return config
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('AUTH_TOKEN', 'test-token')
+    monkeypatch.delenv('DISCORD_WEBHOOK_URL', raising=False)
+    monkeypatch.setattr('src.auth.load_dotenv', lambda: None)
+    monkeypatch.setattr(circuit, '_breaker', None)
+    clock = SimulatedClock(START)
+    set_clock(clock)
+    yield clock
+    set_clock(SystemClock())
+
+@pytest.fixture
+def notifications(monkeypatch):
+    sent = []
+    monkeypatch.setattr(jobs, 'send_discord_notification', sent.append)
+    return sent
+
+def test_follow_run_under_simulated_clock(config, clock, notifications, monkeypatch):
+    api = FakeHevy(clock)
+    monkeypatch.setattr('src.utils.api.requests.request', api.request)
+
+    started = time.monotonic()
+    FollowManager(config).run()
+
+    # request delays happen on the simulated clock, not in real time
+    assert time.monotonic() - started < 5
+    assert clock.time() - START >= 3 * config['api']['request_delay']['min']
+
+    assert api.followed == ['alice', 'bob', 'carol']
+    with open('data/followed_cache.json') as f:
+        assert set(json.load(f)) == {'alice', 'bob', 'carol'}
+    assert notifications[-1].startswith("followed 3 new users:")
+
+def test_feed_outage_is_reported_as_a_failure(config, clock, notifications, monkeypatch):
+    api = FakeHevy(clock, feed_status=503)
+    monkeypatch.setattr('src.utils.api.requests.request', api.request)
+
+    FollowManager(config).run()
+
+    assert api.followed == []
+    assert notifications[-1].startswith("follow process failed: discovery feed unavailable")